@@ -0,0 +1,105 @@
+# About: Compares moving frames from one process to a worker process by pickling them through a,
+#        multiprocessing Queue vs. the shared memory frame ring in modules/frame_transport.py,
+#        at 720p, 1080p, and 4K. Only the transport is timed, the worker just reads the AOI view.
+#
+# Usage: python experiments/bench_frame_transport.py [frames]
+
+import multiprocessing as mp
+import time
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import frame_transport as ft
+
+resolutions = {"720p": (720, 1280, 3), "1080p": (1080, 1920, 3), "4K": (2160, 3840, 3)}
+
+
+# AOI used by the workers, bottom half of the frame
+def aoi(frame):
+    h = frame.shape[0]
+    return frame[h//2:h, :]
+
+
+# worker that receives whole frames through a pickling Queue
+def pickle_worker(work_queue, done_queue):
+    while True:
+        frame = work_queue.get()
+        if frame is None:
+            break
+        done_queue.put(int(aoi(frame)[0, 0, 0]))
+
+
+# worker that receives slot indices and reads the frame from the shared memory ring
+def ring_worker(name, frame_shape, slots, free_slots, work_queue, done_queue):
+    shm, ring = ft.attach_frame_ring(name, frame_shape, slots)
+    while True:
+        slot = work_queue.get()
+        if slot is None:
+            break
+        value = int(aoi(ring[slot])[0, 0, 0])
+        free_slots.put(slot)
+        done_queue.put(value)
+    del ring
+    shm.close()
+
+
+def bench_pickle(ctx, frame_shape, frames):
+    work_queue = ctx.Queue(maxsize=8)
+    done_queue = ctx.Queue()
+    process = ctx.Process(target=pickle_worker, args=(work_queue, done_queue))
+    process.start()
+
+    frame = np.random.randint(0, 255, frame_shape, dtype=np.uint8)
+    start = time.perf_counter()
+    for i in range(frames):
+        work_queue.put(frame)
+    for i in range(frames):
+        done_queue.get()
+    elapsed = time.perf_counter() - start
+
+    work_queue.put(None)
+    process.join()
+    return elapsed
+
+
+def bench_ring(ctx, frame_shape, frames, slots=8):
+    shm, ring = ft.create_frame_ring(frame_shape, slots)
+    free_slots = ctx.Queue()
+    work_queue = ctx.Queue()
+    done_queue = ctx.Queue()
+    for slot in range(slots):
+        free_slots.put(slot)
+    process = ctx.Process(target=ring_worker, args=(shm.name, frame_shape, slots, free_slots, work_queue, done_queue))
+    process.start()
+
+    frame = np.random.randint(0, 255, frame_shape, dtype=np.uint8)
+    start = time.perf_counter()
+    for i in range(frames):
+        slot = free_slots.get()
+        # stands in for cv2.VideoCapture.read(ring[slot]), which decodes straight into the slot
+        ring[slot][0, 0, 0] = frame[0, 0, 0]
+        work_queue.put(slot)
+    for i in range(frames):
+        done_queue.get()
+    elapsed = time.perf_counter() - start
+
+    work_queue.put(None)
+    process.join()
+    del ring
+    shm.close()
+    shm.unlink()
+    return elapsed
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ctx = mp.get_context("spawn")
+
+    print("{:<8}{:>16}{:>16}{:>10}".format("size", "pickle (ms/f)", "ring (ms/f)", "speedup"))
+    for label, frame_shape in resolutions.items():
+        pickled = bench_pickle(ctx, frame_shape, frames) / frames * 1000
+        ring = bench_ring(ctx, frame_shape, frames) / frames * 1000
+        print("{:<8}{:>16.3f}{:>16.3f}{:>9.1f}x".format(label, pickled, ring, pickled / ring))
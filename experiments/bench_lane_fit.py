@@ -0,0 +1,42 @@
+# About: Times fit_lanes() from modules/lane_fit.py on synthetic HoughLinesP segments of a curved,
+#        left and right lane with 20% outlier segments, for different numbers of segments per frame.
+#        The whole fitting stage (both sides) should stay well under 1 ms per frame.
+#
+# Usage: python experiments/bench_lane_fit.py
+
+import time
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import lane_fit as lf
+
+width, height = 1280, 360
+
+
+# segments along x = f(y) for both lanes, with a fraction of random outlier segments
+def synthetic_segments(count, rng, outliers=0.2):
+    y = rng.uniform(0, height, (count, 2))
+    left = 0.3*width - 0.6*y + 0.0004*y*y
+    right = 0.7*width + 0.6*y + 0.0004*y*y
+    x = np.where(rng.random((count, 1)) < 0.5, left, right) + rng.normal(0, 1.5, (count, 2))
+
+    bad = rng.random(count) < outliers
+    x[bad] = rng.uniform(0, width, (bad.sum(), 2))
+    return np.stack([x[:, 0], y[:, 0], x[:, 1], y[:, 1]], axis=1).astype(np.int32)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    runs = 500
+
+    print("{:<10}{:>12}{:>12}{:>12}".format("segments", "ms/frame", "left conf", "right conf"))
+    for count in (25, 50, 100, 200, 400):
+        segments = synthetic_segments(count, rng)
+        start = time.perf_counter()
+        for i in range(runs):
+            left_model, right_model = lf.fit_lanes(segments, width // 2)
+        elapsed = (time.perf_counter() - start) / runs * 1000
+        print("{:<10}{:>12.3f}{:>12.2f}{:>12.2f}".format(count, elapsed, left_model[1], right_model[1]))
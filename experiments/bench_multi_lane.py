@@ -0,0 +1,55 @@
+# About: Times cluster_segments() and assign_lane_ids() from modules/multi_lane.py on synthetic,
+#        HoughLinesP segments of a wide highway with 6 lane boundaries plus 20% noise segments,
+#        for a growing number of segments per frame. Also checks the lane IDs stay the same,
+#        while the lanes slowly drift across the AOI.
+#
+# Usage: python experiments/bench_multi_lane.py
+
+import time
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import multi_lane as ml
+
+width, height = 1920, 400
+boundaries = 6
+
+
+# segments along straight lane boundaries that meet at a vanishing point above the AOI
+def synthetic_segments(count, rng, shift=0.0, noise=0.2):
+    bottoms = np.linspace(-0.2*width, 1.2*width, boundaries) + shift
+    lane = rng.integers(0, boundaries, count)
+    y = np.sort(rng.uniform(0, height, (count, 2)), axis=1)
+    vanish_x = width/2 + shift
+    x = vanish_x + (bottoms[lane][:, np.newaxis] - vanish_x) * (y + 0.5*height) / (1.5*height)
+
+    bad = rng.random(count) < noise
+    x[bad] = rng.uniform(0, width, (bad.sum(), 2))
+    return np.stack([x[:, 0], y[:, 0], x[:, 1], y[:, 1]], axis=1).astype(np.int32)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    runs = 200
+
+    print("{:<10}{:>12}{:>8}".format("segments", "ms/frame", "lanes"))
+    for count in (50, 200, 800, 3200, 12800):
+        segments = synthetic_segments(count, rng)
+        start = time.perf_counter()
+        for i in range(runs):
+            lanes = ml.assign_lane_ids(ml.cluster_segments(segments, width, height), {})
+        elapsed = (time.perf_counter() - start) / runs * 1000
+        print("{:<10}{:>12.3f}{:>8}".format(count, elapsed, len(lanes)))
+
+    # lanes drift 2 pixels per frame, their IDs should never change
+    tracks = {}
+    first = None
+    for frame in range(100):
+        lanes = ml.assign_lane_ids(ml.cluster_segments(synthetic_segments(400, rng, shift=2.0*frame), width, height), tracks)
+        ids = [lane[0] for lane in lanes]
+        if first is None:
+            first = ids
+    print("lane IDs frame 1: " + str(first) + ", frame 100: " + str(ids))
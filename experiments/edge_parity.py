@@ -0,0 +1,86 @@
+# About: Parity check and benchmark of preprocess() in modules/simple_method.py against the original,
+#        blur-then-grayscale path (7x7 Gaussian blur on the 3 channel BGR AOI, then Grayscale, then Canny).
+#        An edge pixel counts as matching if the other edge map has an edge within 1 pixel of it.
+#        Uses the frames of a video if one is given, or synthetic road frames otherwise.
+#
+# Usage: python experiments/edge_parity.py [video] [x1 y1 x2 y2]
+
+import time
+import sys
+import os
+
+import numpy as np
+import cv2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import simple_method as sm
+
+max_mismatch = 0.02  # max fraction of edge pixels without a match within 1 pixel
+
+
+# original path: blur the 3 channel crop, then grayscale, then Canny
+def original_edges(image):
+    edges = cv2.GaussianBlur(image,(7,7),0)
+    edges = cv2.cvtColor(edges, cv2.COLOR_BGR2GRAY)
+    return cv2.Canny(edges,100,200)
+
+
+# fraction of the edge pixels in a that have no edge pixel within 1 pixel in b, and the other way around
+def mismatch(a, b):
+    kernel = np.ones((3, 3), dtype=np.uint8)
+    a_only = np.count_nonzero(a & ~cv2.dilate(b, kernel))
+    b_only = np.count_nonzero(b & ~cv2.dilate(a, kernel))
+    return (a_only + b_only) / max(1, np.count_nonzero(a) + np.count_nonzero(b))
+
+
+# 1080p road-like frames with noise, lanes, and a few cars
+def synthetic_frames(count, rng):
+    for i in range(count):
+        frame = rng.normal(100, 12, (1080, 1920, 3)).clip(0, 255).astype(np.uint8)
+        for x in (200, 700, 1220, 1720):
+            cv2.line(frame, (x + 4*i, 1079), (960, 500), (230, 230, 230), 8)
+        for n in range(3):
+            x, y = rng.integers(300, 1500), rng.integers(600, 900)
+            cv2.rectangle(frame, (x, y), (x + 160, y + 90), [int(c) for c in rng.integers(0, 255, 3)], -1)
+        yield frame
+
+
+def time_per_frame(function, aois):
+    start = time.perf_counter()
+    for aoi in aois:
+        function(aoi)
+    return (time.perf_counter() - start) / len(aois) * 1000
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        from modules import streaming
+        frames = list(streaming.frame_source(sys.argv[1]))[:200]
+        if len(sys.argv) == 6:
+            x1, y1, x2, y2 = [int(v) for v in sys.argv[2:6]]
+        else:
+            x1, y1, x2, y2 = 0, frames[0].shape[0] // 2, frames[0].shape[1], frames[0].shape[0]
+    else:
+        frames = list(synthetic_frames(30, np.random.default_rng(0)))
+        x1, y1, x2, y2 = 0, 540, 1920, 1080
+
+    # AOI views, like classic_lane_detection() uses
+    aois = [frame[y1:y2, x1:x2] for frame in frames]
+
+    paths = {"gray first": lambda aoi: sm.preprocess(aoi),
+             "gray first + box": lambda aoi: sm.preprocess(aoi, box_blur=True)}
+
+    baseline = time_per_frame(original_edges, aois)
+    print("{:<18}{:>12}{:>12}{:>14}".format("path", "ms/frame", "saved ms", "max mismatch"))
+    print("{:<18}{:>12.3f}{:>12}{:>14}".format("original", baseline, "-", "-"))
+
+    failed = False
+    for name, path in paths.items():
+        elapsed = time_per_frame(path, aois)
+        worst = max(mismatch(original_edges(aoi), path(aoi)) for aoi in aois)
+        print("{:<18}{:>12.3f}{:>12.3f}{:>13.2%}".format(name, elapsed, baseline - elapsed, worst))
+        if name == "gray first" and worst > max_mismatch:
+            failed = True
+
+    assert not failed, "gray first edge maps differ from the original by more than {:.0%}".format(max_mismatch)
+    print("PASSED")
@@ -0,0 +1,55 @@
+# About: Soak test of the streaming mode in modules/streaming.py. Streams a synthetic recording,
+#        10 hours at 30 fps by default, through stream_lane_detection() and write_results(), samples
+#        the RSS along the way, and fails if memory grows after the warm up.
+#
+# Usage: python experiments/soak_streaming.py [hours] [fps]
+
+import itertools
+import sys
+import os
+
+import numpy as np
+import cv2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules import streaming
+
+width, height = 320, 180
+tolerance_mb = 8.0
+
+
+# endless stream of fresh frames, lanes sway left and right so the results change every frame
+def synthetic_frames(count):
+    for i in range(count):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        sway = int(20 * np.sin(i / 50.0))
+        cv2.line(frame, (40 + sway, height-1), (140 + sway, 60), (255, 255, 255), 3)
+        cv2.line(frame, (280 + sway, height-1), (180 + sway, 60), (255, 255, 255), 3)
+        yield frame
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    fps = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    count = int(hours * 3600 * fps)
+    samples = []
+
+    # sample the RSS 100 times over the run
+    def sampled(results):
+        step = max(1, count // 100)
+        for result in results:
+            if result[0] % step == 0:
+                samples.append(streaming.rss_mb())
+            yield result
+
+    results = streaming.stream_lane_detection(synthetic_frames(count), [(0, 40), (width, height)], 6,
+                                              memory_budget_mb=4, watchdog_interval=60.0)
+    written = streaming.write_results(sampled(results), os.devnull)
+
+    # ignore the first 10% of the samples (warm up)
+    steady = samples[len(samples) // 10:]
+    growth = max(steady) - steady[0]
+    print("frames: " + str(written) + ", RSS start: {:.1f} MB, growth: {:.2f} MB".format(steady[0], growth))
+    assert written == count, "not every frame was processed"
+    assert growth < tolerance_mb, "memory grew by {:.2f} MB".format(growth)
+    print("PASSED")
@@ -0,0 +1,41 @@
+# About: Measures startup latency of the lane detection pipeline in a fresh interpreter: the time to
+#        import OpenCV and modules/simple_method.py, and the time detect_lanes() takes on the first
+#        frame with and without the warm up from modules/startup.py. Run it before and after a change,
+#        to catch startup regressions.
+#
+# Usage: python experiments/startup_latency.py [width] [height]
+
+import subprocess
+import sys
+import os
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# code ran in a new interpreter, so imports are not already cached
+child = """
+import sys, time
+sys.path.insert(0, {root!r})
+from modules import startup
+metrics = {{}}
+cv2 = startup.timed_import("cv2", metrics)
+sm = startup.timed_import("modules.simple_method", metrics)
+frame = startup.dummy_frame({width}, {height})
+if {warm}:
+    start = time.perf_counter()
+    sm.detect_lanes(frame.copy(), 6, False)
+    metrics["warm_up_ms"] = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+sm.detect_lanes(frame.copy(), 6, False)
+metrics["first_frame_ms"] = (time.perf_counter() - start) * 1000
+startup.print_metrics(metrics)
+"""
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1280
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 720
+
+    for warm in (False, True):
+        print("warm up: " + str(warm))
+        code = child.format(root=root, width=width, height=height, warm=warm)
+        subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,104 @@
+"""
+Title:  Bird's-Eye View
+Description: Optional inverse perspective mapping (IPM) stage. The AOI is warped to a smaller top-down,
+             view where lanes are close to vertical and far away lane pixels are no longer squeezed,
+             into the top rows. The remap tables are built once per AOI size (fixed-point CV_16SC2,
+             maps) and cached, so each frame only costs one cv2.remap() table lookup per pixel.
+             Points found in the warped view are mapped back to AOI coordinates.
+"""
+
+import functools
+import numpy as np
+import cv2
+
+
+def perspective_quad(width, height, top_ratio=0.3):
+    """
+    Default road trapezoid inside the AOI: the whole bottom edge and a centered top edge,
+    top_ratio of the AOI's width. This trapezoid becomes the whole warped view.
+
+    Parameters:
+    :param width: int, width of the AOI.
+    :param height: int, height of the AOI.
+    :param top_ratio: float, width of the trapezoid's top edge as a fraction of the AOI's width.
+
+    Returns:
+    :returns: array, float32 array of shape (4, 2), top-left, top-right, bottom-right, bottom-left.
+    """
+
+    half_top = width * top_ratio / 2
+    return np.float32([[width/2 - half_top, 0], [width/2 + half_top, 0], [width, height], [0, height]])
+
+
+@functools.lru_cache(maxsize=8)
+def build_remap_tables(width, height, out_width=None, out_height=None, top_ratio=0.3):
+    """
+    Builds the remap tables of the bird's-eye warp for an AOI size. The result is cached, so,
+    calling this every frame with the same AOI only builds the tables once.
+
+    Parameters:
+    :param width: int, width of the AOI.
+    :param height: int, height of the AOI.
+    :param out_width: int, width of the warped view, half the AOI's width by default.
+    :param out_height: int, height of the warped view, half the AOI's height by default.
+    :param top_ratio: float, see perspective_quad().
+
+    Returns:
+    :returns: turple, (map1, map2, M, M_inv),
+        map1, map2: arrays, CV_16SC2 and CV_16UC1 maps for cv2.remap().
+        M: array, 3x3 perspective transform from the AOI to the warped view.
+        M_inv: array, 3x3 perspective transform from the warped view to the AOI.
+    """
+
+    if out_width is None:
+        out_width = width // 2
+    if out_height is None:
+        out_height = height // 2
+
+    src = perspective_quad(width, height, top_ratio)
+    dst = np.float32([[0, 0], [out_width, 0], [out_width, out_height], [0, out_height]])
+    M = cv2.getPerspectiveTransform(src, dst)
+    M_inv = cv2.getPerspectiveTransform(dst, src)
+
+    # AOI location of every warped pixel
+    grid = np.mgrid[0:out_height, 0:out_width][::-1].reshape(2, -1).T.astype(np.float32)
+    source = cv2.perspectiveTransform(grid.reshape(-1, 1, 2), M_inv).reshape(out_height, out_width, 2)
+
+    map1, map2 = cv2.convertMaps(source[:, :, 0], source[:, :, 1], cv2.CV_16SC2)
+    return map1, map2, M, M_inv
+
+
+def warp_to_birds_eye(image, tables):
+    """
+    Warps an AOI image to the bird's-eye view.
+
+    Parameters:
+    :param image: array, frame/image, the AOI.
+    :param tables: turple, output of build_remap_tables() for this AOI's size.
+
+    Returns:
+    :returns: array, the warped view.
+    """
+
+    map1, map2, M, M_inv = tables
+    return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+
+def points_to_aoi(P, tables):
+    """
+    Maps points from the bird's-eye view back to the AOI.
+
+    Parameters:
+    :param P: list, a list of (x,y) turples in the warped view.
+    :param tables: turple, output of build_remap_tables().
+
+    Returns:
+    :returns: list, list of (x,y) turples in AOI coordinates.
+    """
+
+    if len(P) == 0:
+        return []
+
+    map1, map2, M, M_inv = tables
+    points = cv2.perspectiveTransform(np.float32(P).reshape(-1, 1, 2), M_inv).reshape(-1, 2)
+    return [(int(round(x)), int(round(y))) for x, y in points.tolist()]
@@ -0,0 +1,259 @@
+"""
+Title:  Shared Memory Frame Transport
+Description: Moves video frames between a capture process and lane detection worker processes through,
+             a ring of fixed-size frame slots in shared memory. Only slot indices and small metadata,
+             are sent though multiprocessing queues, the frames themselves are never pickled.
+"""
+
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import threading
+import queue
+import numpy as np
+import cv2
+
+from modules import simple_method as sm
+
+
+def create_frame_ring(frame_shape, slots):
+    """
+    Allocates a ring of fixed-size frame slots in shared memory.
+
+    Parameters:
+    :param frame_shape: turple, (height, width, channels) of every frame in the video.
+    :param slots: int, number of frame slots in the ring.
+
+    Returns:
+    :returns shm: SharedMemory, the owning shared memory block. The caller must close() and unlink() it.
+    :returns ring: array, uint8 array of shape (slots, height, width, channels) backed by shm.
+    """
+
+    size = int(np.prod(frame_shape)) * slots
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    ring = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=shm.buf)
+    return shm, ring
+
+
+def attach_frame_ring(name, frame_shape, slots):
+    """
+    Attaches to a ring of frame slots created by create_frame_ring() in another process.
+
+    Parameters:
+    :param name: string, name of the shared memory block (shm.name).
+    :param frame_shape: turple, (height, width, channels) of every frame in the video.
+    :param slots: int, number of frame slots in the ring.
+
+    Returns:
+    :returns shm: SharedMemory, the attached shared memory block. The caller must close() it.
+    :returns ring: array, uint8 array of shape (slots, height, width, channels) backed by shm.
+    """
+
+    shm = shared_memory.SharedMemory(name=name)
+    ring = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=shm.buf)
+    return shm, ring
+
+
+def capture_frames(video, ring, free_slots, work_queue, workers, stop):
+    """
+    Reads every frame of a video directly into free slots of the ring and hands the slot index,
+    to the workers. cv2.VideoCapture.read() decodes into the slot itself, so no copy is made.
+
+    Parameters:
+    :param video: cv2.VideoCapture, opened video.
+    :param ring: array, frame ring from create_frame_ring().
+    :param free_slots: Queue, slot indices that are free to be written to.
+    :param work_queue: Queue, (frame, slot) turples sent to the workers.
+    :param workers: int, number of workers, one None is sent to each worker when capturing stops.
+    :param stop: Event, set it to stop capturing early.
+
+    Returns:
+    :returns: int, number of frames captured.
+    """
+
+    frame = 0
+    try:
+        while not stop.is_set():
+            # time out so capturing can be stopped while every slot is in use
+            try:
+                slot = free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            got_image, out = video.read(ring[slot])
+            if not got_image:
+                free_slots.put(slot)
+                break
+
+            # OpenCV allocates a new array if the frame does not fit the slot, the slot would keep the old frame
+            if not np.shares_memory(out, ring[slot]):
+                raise ValueError("Decoded frame of shape " + str(out.shape) + " does not fit the frame ring slots of shape " + str(ring.shape[1:]))
+
+            frame = frame + 1
+            work_queue.put((frame, slot))
+    finally:
+        # tell every worker that there are no more frames
+        for i in range(workers):
+            work_queue.put(None)
+
+    return frame
+
+
+def check_workers(processes, errors):
+    """
+    Raises the first error of the capture thread, or an error if a worker process has died.
+
+    Parameters:
+    :param processes: list, worker processes.
+    :param errors: list, exceptions raised by the capture thread.
+    """
+
+    if len(errors) > 0:
+        raise errors[0]
+
+    for process in processes:
+        if process.exitcode is not None and process.exitcode != 0:
+            raise RuntimeError("Lane worker process " + str(process.pid) + " died with exit code " + str(process.exitcode))
+
+
+def lane_worker(name, frame_shape, slots, crop_points, splits_per_half, work_queue, result_queue):
+    """
+    Worker process loop. Takes slot indices from work_queue, runs detect_lanes() on a view of the,
+    AOI inside the slot, and sends the averaged points (offset to the original image) to result_queue.
+    The slot is given back by the process reading the results, once it is done with the frame.
+
+    Parameters:
+    :param name: string, name of the shared memory block (shm.name).
+    :param frame_shape: turple, (height, width, channels) of every frame in the video.
+    :param slots: int, number of frame slots in the ring.
+    :param crop_points: list, two (x,y) turples of the AOI, top-left & bottom-right.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param work_queue: Queue, (frame, slot) turples or None to stop.
+    :param result_queue: Queue, (frame, slot, avg_points_left, avg_points_right) turples, None when stopped.
+    """
+
+    shm, ring = attach_frame_ring(name, frame_shape, slots)
+    cx1, cy1, cx2, cy2 = sm.crop_edges(crop_points)
+    aoi = None
+
+    try:
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            frame, slot = item
+
+            # view of the AOI inside the shared slot, no copy
+            aoi = ring[slot, cy1:cy2, cx1:cx2]
+            avg_points_left, avg_points_right = sm.detect_lanes(aoi, splits_per_half, False)
+
+            avg_points_left = sm.offset_to_original(avg_points_left, cx1, cy1)
+            avg_points_right = sm.offset_to_original(avg_points_right, cx1, cy1)
+            result_queue.put((frame, slot, avg_points_left, avg_points_right))
+    finally:
+        del aoi, ring
+        shm.close()
+        result_queue.put(None)
+
+
+def shared_memory_lane_detection(video_file, splits_per_half, crop_points, workers=2, slots=8):
+    """
+    Generator that runs detect_lanes() on every frame of a video using worker processes, with frames,
+    moved from cv2.VideoCapture.read() to the workers through a shared memory frame ring. A capture,
+    thread fills the ring while results are handed out in frame order.
+
+    Parameters:
+    :param video_file: string, video file location/name.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param crop_points: list, two (x,y) turples of the AOI, top-left & bottom-right.
+    :param workers: int, number of worker processes.
+    :param slots: int, number of frame slots in the ring, should be greater then workers.
+
+    Returns:
+    :returns: turple, (frame, image, avg_points_left, avg_points_right) for each frame, one at a time.
+        image is a view of the frame inside its slot, it is only valid until the next frame is,
+        requested, copy it to keep it.
+
+    Raises:
+    :raises ValueError: if the video can not be read, or a frame does not fit the ring.
+    :raises RuntimeError: if a worker process dies.
+    """
+
+    video = cv2.VideoCapture(video_file)
+    width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if width == 0 or height == 0:
+        video.release()
+        raise ValueError("Cannot read video source: " + str(video_file))
+
+    frame_shape = (height, width, 3)
+    shm, ring = create_frame_ring(frame_shape, slots)
+
+    # slots are only taken and given back inside this process
+    free_slots = queue.Queue()
+    for slot in range(slots):
+        free_slots.put(slot)
+
+    # spawn the workers, forking after OpenCV has started its thread pool can deadlock
+    ctx = mp.get_context("spawn")
+    work_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+
+    processes = []
+    for i in range(workers):
+        args = (shm.name, frame_shape, slots, crop_points, splits_per_half, work_queue, result_queue)
+        process = ctx.Process(target=lane_worker, args=args, daemon=True)
+        process.start()
+        processes.append(process)
+
+    stop = threading.Event()
+    errors = []
+
+    def capture():
+        try:
+            capture_frames(video, ring, free_slots, work_queue, workers, stop)
+        except Exception as error:
+            errors.append(error)
+
+    reader = threading.Thread(target=capture, daemon=True)
+    reader.start()
+
+    try:
+        # results come back out of order, keep them until it is their turn
+        pending = {}
+        next_frame = 1
+        stopped = 0
+        while stopped < workers:
+            try:
+                result = result_queue.get(timeout=0.5)
+            except queue.Empty:
+                check_workers(processes, errors)
+                continue
+
+            if result is None:
+                stopped = stopped + 1
+                continue
+
+            pending[result[0]] = result
+            while next_frame in pending:
+                frame, slot, avg_points_left, avg_points_right = pending.pop(next_frame)
+                yield frame, ring[slot], avg_points_left, avg_points_right
+                free_slots.put(slot)
+                next_frame = next_frame + 1
+
+        for process in processes:
+            process.join()
+        check_workers(processes, errors)
+    finally:
+        stop.set()
+        reader.join()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        video.release()
+        del ring
+        # the caller may still hold a view of the last frame, the memory is then freed with that view
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        shm.unlink()
@@ -0,0 +1,127 @@
+"""
+Title:  Lane Model Fitting
+Description: Fits a polynomial lane model, x = f(y), directly to the HoughLinesP endpoints of each side,
+             of the AOI using a vectorized RANSAC followed by a least squares refit on the inliers.
+             Unlike average_points(), outlier segments are ignored and the model can be sampled,
+             at any resolution. A lane model is a turple: (coefficients, confidence, (y_min, y_max)).
+"""
+
+import numpy as np
+
+
+def split_segments(segments, mid):
+    """
+    Splits the endpoints of HoughLinesP segments into the left and right side of the image,
+    the same way group_points() does (x <= mid is the left side).
+
+    Parameters:
+    :param segments: array, int array of shape (N, 4), output of find_segments().
+    :param mid: int, middile width location of the image.
+
+    Returns:
+    :returns left_points: array, float array of shape (M, 2) of (x,y) points on the left side.
+    :returns right_points: array, float array of shape (K, 2) of (x,y) points on the right side.
+    """
+
+    points = np.asarray(segments, dtype=np.float64).reshape(-1, 2)
+    on_left = points[:, 0] <= mid
+    return points[on_left], points[~on_left]
+
+
+def fit_lane(points, degree=2, iterations=64, threshold=8.0, seed=0):
+    """
+    Fits x = f(y) to a set of points with RANSAC. Every hypothesis is solved and scored at once,
+    then the best hypothesis' inliers are refit with least squares. The random generator is,
+    seeded so the same points always give the same model.
+
+    Parameters:
+    :param points: array, float array of shape (N, 2) of (x,y) points.
+    :param degree: int, degree of the polynomial, 1 is a straight lane.
+    :param iterations: int, number of RANSAC hypotheses.
+    :param threshold: float, max horizontal distance (pixels) for a point to count as an inlier.
+    :param seed: int, seed of the random generator.
+
+    Returns:
+    :returns: turple, (coefficients, confidence, (y_min, y_max)),
+        coefficients: array, polynomial coefficients, highest power first (like np.polyfit).
+        confidence: float, fraction of the points that are inliers of the model (0 to 1).
+        (y_min, y_max): turple of floats, vertical extent of the inliers.
+        or
+    :returns: none, a none value is returned if there are not enough points for a model.
+    """
+
+    n = len(points)
+    if n < degree + 2:
+        return None
+
+    x = points[:, 0]
+    y = points[:, 1]
+
+    # vandermonde matrix of every point, shape (degree+1, N)
+    powers = np.arange(degree, -1, -1)
+    V = y[np.newaxis, :] ** powers[:, np.newaxis]
+
+    # solve every hypothesis at once, samples with repeated y values are singular,
+    # so they are swapped for the identity matrix and thrown out afterwards
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, n, size=(iterations, degree + 1))
+    A = V.T[samples]
+    singular = np.abs(np.linalg.det(A)) < 1e-9
+    A[singular] = np.eye(degree + 1)
+    coefficients = np.linalg.solve(A, x[samples][:, :, np.newaxis])[:, :, 0]
+
+    # score every hypothesis against every point
+    inliers = np.abs(coefficients @ V - x) < threshold
+    inliers[singular] = False
+    counts = inliers.sum(axis=1)
+    best = inliers[np.argmax(counts)]
+    if best.sum() < degree + 2:
+        return None
+
+    # least squares refit on the inliers of the best hypothesis
+    coefficients = np.linalg.lstsq(V[:, best].T, x[best], rcond=None)[0]
+    inliers = np.abs(coefficients @ V - x) < threshold
+    if inliers.sum() < degree + 2:
+        return None
+
+    confidence = float(inliers.sum()) / n
+    return coefficients, confidence, (float(y[inliers].min()), float(y[inliers].max()))
+
+
+def fit_lanes(segments, mid, degree=2):
+    """
+    Fits a lane model to the left and right side of the AOI.
+
+    Parameters:
+    :param segments: array, int array of shape (N, 4), output of find_segments().
+    :param mid: int, middile width location of the image.
+    :param degree: int, degree of the polynomial of each lane model.
+
+    Returns:
+    :returns left_model: turple or none, output of fit_lane() for the left side.
+    :returns right_model: turple or none, output of fit_lane() for the right side.
+    """
+
+    left_points, right_points = split_segments(segments, mid)
+    return fit_lane(left_points, degree), fit_lane(right_points, degree)
+
+
+def sample_lane(model, samples):
+    """
+    Samples a lane model at evenly spaced rows between the top and bottom of its inliers.
+
+    Parameters:
+    :param model: turple or none, output of fit_lane().
+    :param samples: int, number of points to sample.
+
+    Returns:
+    :returns: list of turples (x,y), points along the lane, ready for draw_lines() or offset_to_original().
+    """
+
+    if model is None:
+        return []
+
+    coefficients, confidence, (y_min, y_max) = model
+    y = np.linspace(y_min, y_max, samples)
+    x = np.polyval(coefficients, y)
+    return list(zip(np.rint(x).astype(int).tolist(), np.rint(y).astype(int).tolist()))
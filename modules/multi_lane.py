@@ -0,0 +1,214 @@
+"""
+Title:  Multi Lane Detection
+Description: Groups HoughLinesP segments into any number of lane boundaries across the AOI, instead of,
+             the fixed left/right split of half_divide(). Each segment votes (by its length) into a,
+             histogram of bottom intercept and angle, peaks of the histogram become lanes, and every,
+             lane keeps a stable ID from frame to frame. Everything is vectorized over the segment
+             array, so the cost grows linearly with the number of segments.
+"""
+
+import numpy as np
+import cv2
+
+
+def segment_lines(segments, height, min_angle=20):
+    """
+    Describes every segment by where its line crosses the bottom of the AOI and its angle.
+    Segments flatter than min_angle (from horizontal) can not be lanes and are dropped.
+
+    Parameters:
+    :param segments: array, int array of shape (N, 4), output of find_segments().
+    :param height: int, height of the AOI.
+    :param min_angle: float, min angle (degrees) between a segment and the horizontal.
+
+    Returns:
+    :returns segments: array, float array of shape (M, 4), the kept segments with y1 <= y2.
+    :returns intercepts: array, float array of shape (M,), x where each segment's line meets y = height.
+    :returns angles: array, float array of shape (M,), angle (degrees) of each segment from vertical.
+    :returns lengths: array, float array of shape (M,), length of each segment.
+    """
+
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+
+    # order the endpoints top to bottom
+    flip = segments[:, 1] > segments[:, 3]
+    segments[flip] = segments[flip][:, [2, 3, 0, 1]]
+
+    dx = segments[:, 2] - segments[:, 0]
+    dy = segments[:, 3] - segments[:, 1]
+    keep = dy > np.abs(dx) * np.tan(np.radians(min_angle))
+    segments, dx, dy = segments[keep], dx[keep], dy[keep]
+
+    intercepts = segments[:, 0] + (height - segments[:, 1]) * dx / dy
+    angles = np.degrees(np.arctan2(dx, dy))
+    lengths = np.hypot(dx, dy)
+    return segments, intercepts, angles, lengths
+
+
+def cluster_segments(segments, width, height, intercept_bin=None, angle_bin=5.0, min_votes=40.0, min_share=0.2):
+    """
+    Clusters segments into lane boundaries using a length weighted histogram of bottom intercept,
+    and angle. Histogram peaks within two bins of a stronger peak are dropped, then every segment is given to,
+    the nearest peak and a line x = a*y + b is fit to each cluster with weighted least squares.
+
+    Parameters:
+    :param segments: array, int array of shape (N, 4), output of find_segments().
+    :param width: int, width of the AOI.
+    :param height: int, height of the AOI.
+    :param intercept_bin: float, histogram bin size of the bottom intercept (pixels), width/32 by default.
+    :param angle_bin: float, histogram bin size of the angle (degrees).
+    :param min_votes: float, min total segment length (pixels) of a lane.
+    :param min_share: float, min votes of a lane as a fraction of the votes of the strongest lane,
+        this keeps noise segments from forming lanes when there are many segments.
+
+    Returns:
+    :returns: list of turples, (intercept, angle, (x1, y1, x2, y2), votes) for each lane sorted left to right.
+        (x1, y1, x2, y2) is the top and bottom of the lane in AOI coordinates.
+    """
+
+    segments, intercepts, angles, lengths = segment_lines(segments, height)
+    if len(segments) == 0:
+        return []
+
+    if intercept_bin is None:
+        intercept_bin = width / 32.0
+
+    # length weighted 2D histogram, lines may cross the bottom outside of the AOI
+    intercept_edges = np.arange(-width/2.0, width*1.5 + intercept_bin, intercept_bin)
+    angle_edges = np.arange(-90.0, 90.0 + angle_bin, angle_bin)
+    H, _, _ = np.histogram2d(intercepts, angles, bins=(intercept_edges, angle_edges), weights=lengths)
+
+    # local maximums of the histogram
+    padded = np.pad(H, 1)
+    neighbors = np.max([padded[1+i:1+i+H.shape[0], 1+j:1+j+H.shape[1]]
+                        for i in (-1, 0, 1) for j in (-1, 0, 1)], axis=0)
+    threshold = max(min_votes, min_share * H.max())
+    peak_i, peak_j = np.nonzero((H == neighbors) & (H >= threshold))
+    if len(peak_i) == 0:
+        return []
+
+    # strongest peaks first, drop peaks within two bins of a stronger one
+    order = np.argsort(-H[peak_i, peak_j], kind="stable")
+    peaks = []
+    for k in order:
+        if all(abs(peak_i[k] - i) > 2 or abs(peak_j[k] - j) > 2 for i, j in peaks):
+            peaks.append((peak_i[k], peak_j[k]))
+    peaks = np.array(peaks, dtype=np.float64)
+
+    # give every segment to its nearest peak (in bins), segments far from every peak are noise
+    seg_i = (intercepts - intercept_edges[0]) / intercept_bin - 0.5
+    seg_j = (angles - angle_edges[0]) / angle_bin - 0.5
+    distance = np.hypot(seg_i[:, np.newaxis] - peaks[:, 0], seg_j[:, np.newaxis] - peaks[:, 1])
+    labels = np.argmin(distance, axis=1)
+    near = distance[np.arange(len(labels)), labels] <= 2.0
+    labels, segments, lengths = labels[near], segments[near], lengths[near]
+
+    # weighted least squares x = a*y + b for every cluster at once, using both endpoints
+    k = len(peaks)
+    x = segments[:, [0, 2]].ravel()
+    y = segments[:, [1, 3]].ravel()
+    w = np.repeat(lengths, 2)
+    label = np.repeat(labels, 2)
+    sw = np.bincount(label, w, k)
+    sy = np.bincount(label, w*y, k)
+    sx = np.bincount(label, w*x, k)
+    syy = np.bincount(label, w*y*y, k)
+    sxy = np.bincount(label, w*x*y, k)
+
+    y_top = np.full(k, np.inf)
+    np.minimum.at(y_top, label, y)
+
+    # sw counts each segment's length twice (once per endpoint)
+    votes = sw / 2
+
+    lanes = []
+    for c in range(k):
+        denominator = sw[c]*syy[c] - sy[c]*sy[c]
+        if votes[c] < threshold or abs(denominator) < 1e-9:
+            continue
+        a = (sw[c]*sxy[c] - sy[c]*sx[c]) / denominator
+        b = (sx[c] - a*sy[c]) / sw[c]
+
+        intercept = a*height + b
+        angle = float(np.degrees(np.arctan(a)))
+        line = (int(round(a*y_top[c] + b)), int(y_top[c]), int(round(intercept)), int(height))
+        lanes.append((float(intercept), angle, line, float(votes[c])))
+
+    lanes.sort(key=lambda lane: lane[0])
+    return lanes
+
+
+def assign_lane_ids(lanes, tracks, max_shift=40.0, max_missed=10):
+    """
+    Gives each lane the ID of the closest lane from previous frames, or a new ID. Lanes are,
+    matched greedily, closest pair first, by bottom intercept plus a weighted angle difference.
+
+    Parameters:
+    :param lanes: list of turples, output of cluster_segments().
+    :param tracks: dictionary, tracking state kept between frames, start with an empty dictionary.
+        "next_id": int, next unused lane ID.
+        "lanes": dictionary, lane ID to (intercept, angle, missed frames).
+    :param max_shift: float, max distance (pixels) a lane can move between frames and keep its ID.
+    :param max_missed: int, number of frames a lane can go undetected before its ID is dropped.
+
+    Returns:
+    :returns: list of turples, (lane_id, (x1, y1, x2, y2), votes) for each lane sorted left to right.
+    """
+
+    tracks.setdefault("next_id", 0)
+    tracks.setdefault("lanes", {})
+    known = tracks["lanes"]
+
+    # every (distance, lane, track) pair, closest first
+    pairs = []
+    for n, (intercept, angle, line, votes) in enumerate(lanes):
+        for lane_id, (track_intercept, track_angle, missed) in known.items():
+            distance = abs(intercept - track_intercept) + 2.0*abs(angle - track_angle)
+            if distance <= max_shift:
+                pairs.append((distance, n, lane_id))
+    pairs.sort()
+
+    ids = [None] * len(lanes)
+    used = set()
+    for distance, n, lane_id in pairs:
+        if ids[n] is None and lane_id not in used:
+            ids[n] = lane_id
+            used.add(lane_id)
+
+    # age the tracks that were not seen this frame
+    for lane_id in list(known):
+        if lane_id not in used:
+            intercept, angle, missed = known[lane_id]
+            if missed + 1 > max_missed:
+                del known[lane_id]
+            else:
+                known[lane_id] = (intercept, angle, missed + 1)
+
+    result = []
+    for n, (intercept, angle, line, votes) in enumerate(lanes):
+        if ids[n] is None:
+            ids[n] = tracks["next_id"]
+            tracks["next_id"] = tracks["next_id"] + 1
+        known[ids[n]] = (intercept, angle, 0)
+        result.append((ids[n], line, votes))
+
+    return result
+
+
+def draw_lanes(image, lanes, cx1, cy1):
+    """
+    Draws every lane and its ID on the original image.
+
+    Parameters:
+    :param image: array, frame/image.
+    :param lanes: list of turples, output of assign_lane_ids().
+    :param cx1: x value offset of the AOI.
+    :param cy1: y value offset of the AOI.
+
+    Returns:
+    :returns: Draws the lanes and their IDs on the inputed image.
+    """
+
+    for lane_id, (x1, y1, x2, y2), votes in lanes:
+        cv2.line(image, (x1+cx1, y1+cy1), (x2+cx1, y2+cy1), (255, 255, 0), 10)
+        cv2.putText(image, text=str(lane_id), org=(x2+cx1, y2+cy1-10), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1, color=(255, 0, 255), thickness=2)
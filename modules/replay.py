@@ -0,0 +1,283 @@
+"""
+Title:  Deterministic Replay & Result Diffing
+Description: Records a run of the pipeline to a compact log (a SQLite file indexed by frame number):
+             the parameters, a hash of every input frame, the averaged left/right points (after,
+             offset_to_original()), and the time of each stage. Two logs, ex: before and after a change,
+             are then diffed frame by frame to report moved points, detection flips, and timing deltas.
+
+Usage:
+    python -m modules.replay record <video> <x1> <y1> <x2> <y2> <splits_per_half> <log>
+    python -m modules.replay diff <log_a> <log_b> [tolerance]
+"""
+
+import hashlib
+import sqlite3
+import json
+import time
+import sys
+import os
+
+import numpy as np
+
+from modules import simple_method as sm
+
+# stages timed per frame, in pipeline order
+stages = ["segments_ms", "grouping_ms"]
+
+
+def pack_points(P):
+    """
+    Packs a list of (x,y) turples into int32 bytes.
+
+    Parameters:
+    :param P: list, a list of (x,y) turples.
+
+    Returns:
+    :returns: bytes, 8 bytes per point.
+    """
+
+    return np.array(P, dtype=np.int32).reshape(-1, 2).tobytes()
+
+
+def unpack_points(blob):
+    """
+    Unpacks bytes from pack_points() into a list of (x,y) turples.
+
+    Parameters:
+    :param blob: bytes, output of pack_points().
+
+    Returns:
+    :returns: list, a list of (x,y) turples.
+    """
+
+    return [tuple(p) for p in np.frombuffer(blob, dtype=np.int32).reshape(-1, 2).tolist()]
+
+
+def frame_hash(frame):
+    """
+    Short hash of a frame's pixels, used to check two runs were fed the same frames.
+
+    Parameters:
+    :param frame: array, frame/image.
+
+    Returns:
+    :returns: bytes, 8 byte BLAKE2b digest.
+    """
+
+    return hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=8).digest()
+
+
+def open_log(log_path, create=False):
+    """
+    Opens a replay log, creating its tables if create is True.
+
+    Parameters:
+    :param log_path: string, log file location/name.
+    :param create: boolean, start a new log, an existing file at log_path is replaced.
+
+    Returns:
+    :returns: Connection, SQLite connection to the log.
+    """
+
+    if create and os.path.exists(log_path):
+        os.remove(log_path)
+
+    log = sqlite3.connect(log_path)
+    if create:
+        log.execute("PRAGMA journal_mode = OFF")
+        log.execute("PRAGMA synchronous = OFF")
+        log.execute("CREATE TABLE run (key TEXT PRIMARY KEY, value TEXT)")
+        log.execute("CREATE TABLE frames (frame INTEGER PRIMARY KEY, hash BLOB, left_points BLOB, right_points BLOB, "
+                    + ", ".join(stage + " REAL" for stage in stages) + ")")
+    return log
+
+
+def record_run(frames, crop_points, splits_per_half, log_path, batch=1000):
+    """
+    Runs the pipeline on every frame and records its inputs, outputs, and stage timings to a log.
+
+    Parameters:
+    :param frames: iterable, frames/images, ex: streaming.frame_source().
+    :param crop_points: list, two (x,y) turples of the AOI, top-left & bottom-right.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param log_path: string, log file location/name, replaced if it exists.
+    :param batch: int, number of frames written to the log at once.
+
+    Returns:
+    :returns: int, number of frames recorded.
+    """
+
+    cx1, cy1, cx2, cy2 = sm.crop_edges(crop_points)
+
+    log = open_log(log_path, create=True)
+    parameters = {"crop_points": [list(p) for p in crop_points], "splits_per_half": splits_per_half}
+    log.executemany("INSERT INTO run VALUES (?, ?)", [(k, json.dumps(v)) for k, v in parameters.items()])
+
+    insert = "INSERT INTO frames VALUES (?, ?, ?, ?, " + ", ".join("?" for stage in stages) + ")"
+    rows = []
+    frame = 0
+    for img in frames:
+        frame = frame + 1
+        aoi = img[cy1:cy2, cx1:cx2]
+
+        start = time.perf_counter()
+        segments = sm.find_segments(aoi)
+        middle = time.perf_counter()
+        avg_points_left, avg_points_right = sm.detect_lanes(aoi, splits_per_half, False, segments)
+        end = time.perf_counter()
+
+        avg_points_left = sm.offset_to_original(avg_points_left, cx1, cy1)
+        avg_points_right = sm.offset_to_original(avg_points_right, cx1, cy1)
+
+        rows.append((frame, frame_hash(img), pack_points(avg_points_left), pack_points(avg_points_right),
+                     (middle - start) * 1000, (end - middle) * 1000))
+        if len(rows) >= batch:
+            log.executemany(insert, rows)
+            rows = []
+
+    log.executemany(insert, rows)
+    log.commit()
+    log.close()
+    return frame
+
+
+def compare_points(before, after, tolerance):
+    """
+    Compares one side's points of the same frame from two logs.
+
+    Parameters:
+    :param before: list, (x,y) turples from the first log.
+    :param after: list, (x,y) turples from the second log.
+    :param tolerance: float, max distance (pixels) a point can move and still count as unchanged.
+
+    Returns:
+    :returns: turple, (kind, value) or none if nothing changed,
+        ("lost", 0) or ("found", 0): the lane was detected in only one of the logs.
+        ("count", n): the number of points changed by n.
+        ("moved", d): the furthest moved point moved d pixels.
+    """
+
+    if len(before) > 0 and len(after) == 0:
+        return "lost", 0
+    if len(before) == 0 and len(after) > 0:
+        return "found", 0
+    if len(before) != len(after):
+        return "count", len(after) - len(before)
+    if len(before) == 0:
+        return None
+
+    moved = float(np.max(np.hypot(*(np.array(after) - np.array(before)).T)))
+    if moved > tolerance:
+        return "moved", moved
+    return None
+
+
+def diff_logs(log_a, log_b, tolerance=0):
+    """
+    Diffs two replay logs frame by frame. The frame join and the filtering of unchanged frames,
+    happen inside SQLite on the frame index, so only changed frames reach Python.
+
+    Parameters:
+    :param log_a: string, first (before) log file location/name.
+    :param log_b: string, second (after) log file location/name.
+    :param tolerance: float, max distance (pixels) a point can move and still count as unchanged.
+
+    Returns:
+    :returns: dictionary,
+        "frames": int, number of frames in both logs.
+        "missing": int, number of frames in only one of the logs.
+        "inputs": list, frames whose input hash differs.
+        "changes": list of turples, (frame, side, kind, value), see compare_points().
+        "timing": dictionary, stage name to mean time difference (ms, b - a) per frame.
+        "parameters": list of turples, (key, value_a, value_b) for every run parameter that differs,
+            a value is None if that log does not have the parameter.
+
+    Raises:
+    :raises FileNotFoundError: if either log does not exist. SQLite would silently create an empty one.
+    """
+
+    for log_path in (log_a, log_b):
+        if not os.path.isfile(log_path):
+            raise FileNotFoundError("Replay log does not exist: " + str(log_path))
+
+    log = open_log(log_a)
+    log.execute("ATTACH DATABASE ? AS other", (log_b,))
+
+    # run parameters (AOI, splits_per_half, ...) that differ between the two logs
+    run_a = dict(log.execute("SELECT key, value FROM main.run"))
+    run_b = dict(log.execute("SELECT key, value FROM other.run"))
+    parameters = []
+    for key in sorted(set(run_a) | set(run_b)):
+        if run_a.get(key) != run_b.get(key):
+            value_a = json.loads(run_a[key]) if key in run_a else None
+            value_b = json.loads(run_b[key]) if key in run_b else None
+            parameters.append((key, value_a, value_b))
+
+    frames, in_a, in_b = log.execute(
+        "SELECT (SELECT COUNT(*) FROM main.frames JOIN other.frames USING (frame)), "
+        "(SELECT COUNT(*) FROM main.frames), (SELECT COUNT(*) FROM other.frames)").fetchone()
+
+    timing = log.execute("SELECT " + ", ".join("AVG(b.{0} - a.{0})".format(stage) for stage in stages)
+                         + " FROM main.frames AS a JOIN other.frames AS b USING (frame)").fetchone()
+
+    inputs = []
+    changes = []
+    rows = log.execute(
+        "SELECT frame, a.hash != b.hash, a.left_points, b.left_points, a.right_points, b.right_points "
+        "FROM main.frames AS a JOIN other.frames AS b USING (frame) "
+        "WHERE a.hash != b.hash OR a.left_points != b.left_points OR a.right_points != b.right_points "
+        "ORDER BY frame")
+    for frame, new_input, left_a, left_b, right_a, right_b in rows:
+        if new_input:
+            inputs.append(frame)
+        for side, before, after in (("left", left_a, left_b), ("right", right_a, right_b)):
+            change = compare_points(unpack_points(before), unpack_points(after), tolerance)
+            if change is not None:
+                changes.append((frame, side) + change)
+
+    log.close()
+    return {"frames": frames, "missing": in_a + in_b - 2*frames, "inputs": inputs, "changes": changes,
+            "timing": dict(zip(stages, timing)), "parameters": parameters}
+
+
+def print_diff(diff, limit=50):
+    """
+    Prints a summary of diff_logs() and up to limit changed frames.
+
+    Parameters:
+    :param diff: dictionary, output of diff_logs().
+    :param limit: int, max number of changes printed.
+    """
+
+    changed = len(set(change[0] for change in diff["changes"]))
+    for key, value_a, value_b in diff["parameters"]:
+        print("parameter " + key + " changed: " + str(value_a) + " -> " + str(value_b))
+    print("frames compared: " + str(diff["frames"]) + ", frames missing: " + str(diff["missing"]))
+    print("frames with different inputs: " + str(len(diff["inputs"])))
+    print("frames with different outputs: " + str(changed))
+    for stage, delta in diff["timing"].items():
+        if delta is not None:
+            print(stage + " mean delta: {:+.3f} ms".format(delta))
+
+    for frame, side, kind, value in diff["changes"][:limit]:
+        print("  frame " + str(frame) + ", " + side + ": " + kind + " " + str(value))
+    if len(diff["changes"]) > limit:
+        print("  ... " + str(len(diff["changes"]) - limit) + " more")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 9 and sys.argv[1] == "record":
+        from modules import streaming
+        video, x1, y1, x2, y2, splits_per_half, log_path = sys.argv[2:]
+        crop_points = [(int(x1), int(y1)), (int(x2), int(y2))]
+        count = record_run(streaming.frame_source(video), crop_points, int(splits_per_half), log_path)
+        print("recorded " + str(count) + " frames to " + log_path)
+    elif len(sys.argv) in (4, 5) and sys.argv[1] == "diff":
+        tolerance = float(sys.argv[4]) if len(sys.argv) == 5 else 0
+        try:
+            print_diff(diff_logs(sys.argv[2], sys.argv[3], tolerance))
+        except FileNotFoundError as error:
+            print(error)
+            sys.exit(1)
+    else:
+        print(__doc__)
@@ -4,10 +4,15 @@ Description: This code uses a combination of AOI, Thresholding, Canny, HoughLine
              to detect the left and right lane of a driving car using classical computer vision methods. 
 """
 
+import numpy as np
 import math
+import time
 import sys
 import cv2
-import os
+
+from modules import multi_lane as ml
+from modules import birds_eye as be
+from modules import lane_fit as lf
 
 
 def draw_lines(image, color, thickness, points):
@@ -304,13 +309,172 @@ def highlight_lanes(draw_image, avg_points_left, avg_points_right):
     draw_points(draw_image, avg_points_right, draw_points_color, draw_points_thickness)
 
 
-def classic_lane_detection(video_file, splits_per_half):
+def preprocess(image, box_blur=False):
+    """
+    Converts an image to Grayscale, blurs it, and applies Canny. The image is converted to Grayscale
+    first so the blur only runs on one channel instead of three, and the Grayscale conversion reads,
+    the AOI view directly so cropping, Grayscale, and blurring need no extra copies of the frame.
+
+    Parameters:
+    :param image: array, BGR frame/image, ideally the AOI. This may be a view into a larger frame.
+    :param box_blur: boolean, use a 5x5 box blur, which has about the same spread as the 7x7 Gaussian,
+        blur but is cheaper.
+
+    Returns:
+    :returns: array, Canny edge map of the image.
+    """
+
+    # crop & grayscale in one pass over the AOI view
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    # blur the single channel in place
+    if(box_blur):
+        cv2.blur(gray, (5,5), dst=gray)
+    else:
+        cv2.GaussianBlur(gray, (7,7), 0, dst=gray)
+
+    return cv2.Canny(gray,100,200)
+
+
+def find_segments(image, box_blur=False):
+    """
+    Applies Grayscale, Gaussian Blur, Canny, and HoughLinesP to an image and returns the line
+    segments found by HoughLinesP.
+
+    Parameters:
+    :param image: array, frame/image, ideally the AOI.
+    :param box_blur: boolean, use a box blur instead of the Gaussian blur, see preprocess().
+
+    Returns:
+    :returns: array, int32 array of shape (N, 4), one (x1, y1, x2, y2) row per line segment.
+    """
+
+    # apply filters, thresholdings, and Canny
+    edges = preprocess(image, box_blur)
+
+    # apply HoughLinesP to determine lines/points of possible lanes
+    points = cv2.HoughLinesP(edges, rho=1.0, theta=math.pi/180, threshold=20, minLineLength=10, maxLineGap=10)
+
+    if points is None:
+        return np.empty((0, 4), dtype=np.int32)
+    return points.reshape(-1, 4)
+
+
+def detect_lanes(image, splits_per_half, show_points=True, segments=None):
+    """
+    Runs the detection stages (Grayscale, Gaussian Blur, Canny, HoughLinesP, dividing,
+    grouping, and averaging) on an AOI image and returns the averaged lane points.
+
+    Parameters:
+    :param image: array, frame/image, ideally the AOI. This may be a view into a larger frame.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param show_points: boolean, draw the HoughLinesP points and divides on the inputed image.
+    :param segments: array, output of find_segments() for this image, if it was already computed.
+
+    Returns:
+    :returns avg_points_left: list of turples (x,y), averaged points of the left lane in AOI coordinates.
+    :returns avg_points_right: list of turples (x,y), averaged points of the right lane in AOI coordinates.
+    """
+
+    if segments is None:
+        segments = find_segments(image)
+
+    # store all the points from HoughLinesP
+    P = []
+    for x1, y1, x2, y2 in segments.tolist():
+
+        # draw points found from HoughLinesP 
+        if(show_points):
+            cv2.circle(image, (x1, y1), 5, [0, 0, 0], -1)
+            cv2.circle(image, (x2, y2), 5, [0, 0, 0], -1)
+
+        P.append((x1, y1))
+        P.append((x2, y2))
+
+    # divide the AOI image in half, then divide those halfs splits_per_half amount of times
+    P_left, P_right, mid = half_divide(image, splits_per_half, show_points)
+
+    # cluster points on left and right side
+    left_group, right_group = group_points(splits_per_half, mid, P, P_left, P_right)
+
+    # average clusters' points into one point per clustering
+    avg_points_left, avg_points_right = average_points(left_group, right_group)
+
+    # draw clustering process to AOI image (Window 2)
+    #highlight_lanes(image, avg_points_left, avg_points_right)
+
+    return avg_points_left, avg_points_right
+
+
+def select_aoi(image, crop_points):
+    """
+    Opens a window where the user clicks the top-left & bottom-right corners of the AOI,
+    then waits for SPACE.
+
+    Parameters:
+    :param image: array, frame/image the AOI is picked on.
+    :param crop_points: list, the two clicked (x,y) turples are appended to this list.
+
+    Returns:
+    :returns: Window 1, AOI selection OpenCV window.
+    """
+
+    window_name = "[Set AOI]-[Pick Top-Left & Bottom-Right Crop Corners]-[SPACE->Start]"
+
+    # rather mouse clicks on image, to determine the two points needed to apply AOI
+    mouse_display = image.copy()
+
+    # open window for mouse input
+    cv2.imshow(window_name, mouse_display)
+    cv2.setMouseCallback(window_name, on_mouse=get_xy, param=(window_name, mouse_display, crop_points))
+    cv2.waitKey(0)
+
+    # close mouse window
+    cv2.destroyAllWindows()
+
+
+def draw_lane_status(og, frame, avg_points_left, avg_points_right):
+    """
+    Draws the frame number, the left & right lane detection messages, and the lanes on the original image.
+
+    Parameters:
+    :param og: array, frame/image, the original frame.
+    :param frame: int, frame number.
+    :param avg_points_left: list, list of (x,y) turples of the left lane on the original image.
+    :param avg_points_right: list, list of (x,y) turples of the right lane on the original image.
+
+    Returns:
+    :returns: Draws the messages and lanes on the inputed image.
+    """
+
+    # display current frame number on main image
+    cv2.putText(og, text=str(frame), org=(20, 50), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1.5, color=(0, 0, 0), thickness=3)
+
+    # display message of rather or not the left and/or the right lane has been detected or not
+    left_message = "Left Lane NOT Detected"
+    right_message = "Right Lane NOT Detected"
+    if(len(avg_points_left) > 0):
+        left_message = "Left Lane DETECTED"
+    if(len(avg_points_right) > 0):
+        right_message = "Right Lane DETECTED"
+
+    # left lane detection status image message
+    cv2.putText(og, text=left_message, org=(20, 110), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.65, color=(0, 0, 0), thickness=2)
+
+    # right lane detection status image message
+    cv2.putText(og, text=right_message, org=(20, 180), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.65, color=(0, 0, 0), thickness=2)
+
+    # draw highlight lanes on the original image (Window 3)
+    highlight_lanes(og, avg_points_left, avg_points_right)
+
+
+def classic_lane_detection(video_file, splits_per_half, metrics=None, lane_fit=False, lane_samples=20, multi_lane=False, birds_eye=False, workers=0):
     """
     Serves as the main function of classic_lane_detection, given a video file location and
     a splits_per_half value, the following processed occur to detect and highlight the 1-2,
     lanes the driving vechile is in:
         1) AOI/cropping is selected
-        2) Gaussian Blur & Grayscale is applied
+        2) Grayscale & Gaussian Blur is applied
         3) Canny and HoughLinesP is applied
         4) The AOI is divided in half then into groups/cluster for each half
         5) Points are clustered based on the divided from step 4
@@ -321,6 +485,19 @@ def classic_lane_detection(video_file, splits_per_half):
     Parameters:
     :param video_file: string, video file location/name.
     :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param metrics: dictionary, if given the time detect_lanes() took on the first frame,
+        is stored under "first_frame_ms".
+    :param lane_fit: boolean, replace steps 4-6 with a RANSAC polynomial lane model per side,
+        from modules/lane_fit.py. The lanes are then drawn from points sampled along each model,
+        and Window 2 only shows the HoughLinesP points (no divides).
+    :param lane_samples: int, number of points sampled along each lane model when lane_fit is True.
+    :param multi_lane: boolean, also detect every lane boundary in the AOI (not just left & right),
+        with modules/multi_lane.py, and draw each one with its lane ID.
+    :param birds_eye: boolean, run steps 2-7 on a smaller top-down (bird's-eye) warp of the AOI,
+        from modules/birds_eye.py, then map the found points back to the AOI.
+    :param workers: int, if greater then 0, steps 2-7 run in this many worker processes that get
+        the frames through the shared memory frame ring in modules/frame_transport.py. The other
+        options are not used in this mode.
 
     Returns:
     :returns: Window 1, AOI selection OpenCV window.
@@ -339,6 +516,29 @@ def classic_lane_detection(video_file, splits_per_half):
 
     crop_points = []    # list that will hold 2 turple points, (x,y), which will be used from AOI/cropping
 
+    # run the detection in worker processes, frames are handed over through shared memory
+    if(workers > 0):
+        video.release()
+        select_aoi(img, crop_points)
+        cx1, cy1, cx2, cy2 = crop_edges(crop_points)
+
+        # lazy import, only needed in this mode
+        from modules import frame_transport as ft
+
+        for frame, image, avg_points_left, avg_points_right in ft.shared_memory_lane_detection(video_file, splits_per_half, crop_points, workers):
+            # copy out of the shared slot, it is reused once the next frame is requested
+            og = image.copy()
+            del image
+
+            cv2.imshow("Selected AOI Point Of View", og[cy1:cy2, cx1:cx2].copy())
+            draw_lane_status(og, frame, avg_points_left, avg_points_right)
+            cv2.imshow("Original Frame/Video", og)
+
+            cv2.waitKey(30)
+        return
+
+    tracks = {} # lane IDs kept between frames, used when multi_lane is True
+
     frame = 0 # count number of frames
 
     # loop though each frame in video
@@ -357,18 +557,7 @@ def classic_lane_detection(video_file, splits_per_half):
 
         # wait for user to selected AOI (Windows 1)
         if(frame == 0):
-            window_name = "[Set AOI]-[Pick Top-Left & Bottom-Right Crop Corners]-[SPACE->Start]"
-
-            # rather mouse clicks on image, to determine the two points needed to apply AOI
-            mouse_display = image.copy()
-
-            # open window for mouse input
-            cv2.imshow(window_name, mouse_display)
-            cv2.setMouseCallback(window_name, on_mouse=get_xy, param=(window_name, mouse_display, crop_points))
-            cv2.waitKey(0)
-
-            # close mouse window
-            cv2.destroyAllWindows()
+            select_aoi(image, crop_points)
 
         # load variables from determined AOI points
         cx1, cy1, cx2, cy2 = crop_edges(crop_points)
@@ -378,73 +567,52 @@ def classic_lane_detection(video_file, splits_per_half):
 
         image = img
 
-        frame = frame + 1 # add to frame counter
-
-        # display current frame number on main image
-        cv2.putText(og, text=str(frame), org=(20, 50), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=1.5, color=(0, 0, 0), thickness=3)
-
-        # apply filters, thresholdings, and Canny
-        image = cv2.GaussianBlur(image,(7,7),0)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        image = cv2.Canny(image,100,200)
-
-        # apply HoughLinesP to determine lines/points of possible lanes
-        points = cv2.HoughLinesP(image, rho=1.0, theta=math.pi/180, threshold=20, minLineLength=10, maxLineGap=10)
-
-        # store all the points from HoughLinesP
-        P = []
-        if points is not None:
-            for point in points:
-                x1, y1, x2, y2 = point[0]
+        # warp the AOI to a top-down view, the remap tables are only built for the first frame
+        if(birds_eye):
+            tables = be.build_remap_tables(img.shape[1], img.shape[0])
+            image = be.warp_to_birds_eye(img, tables)
 
-                # draw points found from HoughLinesP 
-                cv2.circle(img, (x1, y1), 5, [0, 0, 0], -1)
-                cv2.circle(img, (x2, y2), 5, [0, 0, 0], -1)
-
-                P.append((x1, y1))
-                P.append((x2, y2))
-
-        draw_image = img
-
-        # divide the AOI image in half, then divide those halfs splits_per_half amount of times
-        P_left, P_right, mid= half_divide(draw_image, splits_per_half, True)
-
-        # cluster points on left and right side
-        left_group, right_group = group_points(splits_per_half, mid, P, P_left, P_right)
+        frame = frame + 1 # add to frame counter
 
-        # average clusters' points into one point per clustering
-        avg_points_left, avg_points_right = average_points(left_group, right_group)
+        # detect the left and right lanes in the AOI (Window 2)
+        start = time.perf_counter()
+        segments = find_segments(image)
+        if(lane_fit):
+            # replace the dividing, grouping, and averaging with points sampled along a fitted lane model
+            draw_points(image, [tuple(p) for p in segments.reshape(-1, 2).tolist()], [0, 0, 0], 5)
+            left_model, right_model = lf.fit_lanes(segments, int(image.shape[1]/2))
+            avg_points_left = lf.sample_lane(left_model, lane_samples)
+            avg_points_right = lf.sample_lane(right_model, lane_samples)
+        else:
+            avg_points_left, avg_points_right = detect_lanes(image, splits_per_half, segments=segments)
+        if(metrics is not None and frame == 1):
+            metrics["first_frame_ms"] = (time.perf_counter() - start) * 1000
 
-        # draw clustering process to AOI image (Window 2)
-        #highlight_lanes(img, avg_points_left, avg_points_right)
+        # map points from the top-down view back to the AOI
+        if(birds_eye):
+            avg_points_left = be.points_to_aoi(avg_points_left, tables)
+            avg_points_right = be.points_to_aoi(avg_points_right, tables)
 
         # offset averaged points to original image
         avg_points_left = offset_to_original(avg_points_left, cx1, cy1)
         avg_points_right = offset_to_original(avg_points_right, cx1, cy1)
 
-        # display message of rather or not the left and/or the right lane has been detected or not
-        left_message = "Left Lane NOT Detected"
-        right_message = "Right Lane NOT Detected"
-        if(len(avg_points_left) > 0):
-            left_message = "Left Lane DETECTED"
-        if(len(avg_points_right) > 0):
-            right_message = "Right Lane DETECTED"
-        
-        # left lane detection status image message
-        cv2.putText(og, text=left_message, org=(20, 110), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.65, color=(0, 0, 0), thickness=2)
-        
-        # right lane detection status image message
-        cv2.putText(og, text=right_message, org=(20, 180), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.65, color=(0, 0, 0), thickness=2)
-
-        # draw highlight lanes on the original image (Window 3)
-        highlight_lanes(og, avg_points_left, avg_points_right)
+        # draw the frame number, detection messages, and lanes on the original image (Window 3)
+        draw_lane_status(og, frame, avg_points_left, avg_points_right)
+
+        # draw every lane boundary found in the AOI with its lane ID (Window 3)
+        if(multi_lane):
+            lanes = ml.cluster_segments(segments, image.shape[1], image.shape[0])
+            lanes = ml.assign_lane_ids(lanes, tracks)
+            if(birds_eye):
+                for n, (lane_id, line, votes) in enumerate(lanes):
+                    top, bottom = be.points_to_aoi([line[:2], line[2:]], tables)
+                    lanes[n] = (lane_id, top + bottom, votes)
+            ml.draw_lanes(og, lanes, cx1, cy1)
+            cv2.putText(og, text="Lanes DETECTED: " + str(len(lanes)), org=(20, 250), fontFace=cv2.FONT_HERSHEY_SIMPLEX, fontScale=0.65, color=(0, 0, 0), thickness=2)
 
         # display the windows
         cv2.imshow("Original Frame/Video", og)
-        cv2.imshow("Selected AOI Point Of View", img)
+        cv2.imshow("Selected AOI Point Of View", image)
 
         cv2.waitKey(30)
-
-
-
-
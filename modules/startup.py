@@ -0,0 +1,119 @@
+"""
+Title:  Fast Startup
+Description: Methods for cutting the time before the first frame is shown. Heavy modules (OpenCV),
+             are imported in the background while the user is still typing, and the detection,
+             pipeline is warmed up on a dummy frame so the first real frame does not pay for,
+             OpenCV's first-call initialization. Import, warm up, and first frame latencies are,
+             recorded in a metrics dictionary so startup regressions can be tracked.
+"""
+
+import importlib
+import threading
+import time
+
+
+def timed_import(module_name, metrics):
+    """
+    Imports a module and records how long the import took.
+
+    Parameters:
+    :param module_name: string, full name of the module (ex: "modules.simple_method").
+    :param metrics: dictionary, the import time is stored under "import_<module_name>_ms".
+
+    Returns:
+    :returns: module, the imported module.
+    """
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    metrics.setdefault("import_" + module_name + "_ms", (time.perf_counter() - start) * 1000)
+    return module
+
+
+def preload(module_names, metrics):
+    """
+    Starts importing modules in a background thread, ideally while the main thread waits
+    for user input. Calling timed_import() afterwards waits for the import to finish.
+
+    Parameters:
+    :param module_names: list, full names of the modules to import.
+    :param metrics: dictionary, import times are stored like in timed_import().
+
+    Returns:
+    :returns: Thread, the started background thread.
+    """
+
+    def run():
+        for module_name in module_names:
+            timed_import(module_name, metrics)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def dummy_frame(width, height):
+    """
+    Creates a gray frame with two white lane-like lines, so every detection stage
+    (Canny, HoughLinesP, grouping, and averaging) has work to do during warm up.
+
+    Parameters:
+    :param width: int, width of the frame.
+    :param height: int, height of the frame.
+
+    Returns:
+    :returns: array, BGR frame/image.
+    """
+
+    import numpy as np
+    import cv2
+
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    thickness = max(2, width // 200)
+    cv2.line(frame, (width//8, height-1), (width*2//5, height//3), (255, 255, 255), thickness)
+    cv2.line(frame, (width*7//8, height-1), (width*3//5, height//3), (255, 255, 255), thickness)
+    return frame
+
+
+def warm_up(video_file, splits_per_half, metrics):
+    """
+    Runs detect_lanes() once on a dummy frame with the same resolution as the video, before
+    any frame is timed or shown.
+
+    Parameters:
+    :param video_file: string, video file location/name.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param metrics: dictionary, the warm up time is stored under "warm_up_ms".
+
+    Returns:
+    :returns: boolean, True if the pipeline was warmed up, False if the video can not be read.
+    """
+
+    cv2 = timed_import("cv2", metrics)
+    sm = timed_import("modules.simple_method", metrics)
+
+    video = cv2.VideoCapture(video_file)
+    width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video.release()
+    if width == 0 or height == 0:
+        return False
+
+    start = time.perf_counter()
+    sm.detect_lanes(dummy_frame(width, height), splits_per_half, False)
+    metrics["warm_up_ms"] = (time.perf_counter() - start) * 1000
+    return True
+
+
+def print_metrics(metrics):
+    """
+    Prints every recorded startup metric, one per line.
+
+    Parameters:
+    :param metrics: dictionary, metric names and their values in milliseconds.
+    """
+
+    print("\033[4m" + "Startup Metrics" + "\033[0m")
+    for name in sorted(metrics):
+        print(str(name) + ": " + "{:.2f}".format(metrics[name]))
+    print()
@@ -0,0 +1,197 @@
+"""
+Title:  Streaming Lane Detection
+Description: Memory bounded streaming mode for long (multi-hour) recordings. Frames are read by a,
+             background thread into a bounded queue sized from a memory budget, results are emitted,
+             frame by frame through a generator (nothing is kept per frame), output writers are flushed,
+             periodically, and a watchdog thread reports the RSS and queue depths.
+"""
+
+import threading
+import queue
+import mmap
+
+from modules import simple_method as sm
+
+
+def rss_mb():
+    """
+    Current resident set size (RSS) of this process.
+
+    Returns:
+    :returns: float, RSS in megabytes. If /proc is not available, the peak RSS is returned instead.
+    """
+
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * mmap.PAGESIZE / (1024 * 1024)
+    except OSError:
+        # resource is Unix only, ru_maxrss is in kilobytes on Linux
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def frame_source(video_file):
+    """
+    Generator of every frame of a video.
+
+    Parameters:
+    :param video_file: string, video file location/name.
+
+    Returns:
+    :returns: array, each frame/image of the video, one at a time.
+    """
+
+    import cv2
+
+    video = cv2.VideoCapture(video_file)
+    try:
+        while True:
+            got_image, img = video.read()
+            if not got_image:
+                break
+            yield img
+    finally:
+        video.release()
+
+
+def start_watchdog(queues, memory_budget_mb, interval=5.0, report=print):
+    """
+    Starts a thread that reports the RSS growth and the depth of every queue every interval seconds,
+    and warns when the RSS has grown past the memory budget.
+
+    Parameters:
+    :param queues: dictionary, name to Queue of every queue to report.
+    :param memory_budget_mb: float, allowed RSS growth (megabytes) from when the watchdog started.
+    :param interval: float, seconds between reports.
+    :param report: function, called with each report string.
+
+    Returns:
+    :returns thread: Thread, the started watchdog thread.
+    :returns stop: Event, set it to stop the watchdog.
+    """
+
+    stop = threading.Event()
+    baseline = rss_mb()
+
+    def run():
+        while not stop.wait(interval):
+            growth = rss_mb() - baseline
+            depths = ", ".join(name + ": " + str(q.qsize()) for name, q in queues.items())
+            message = "RSS +{:.1f} MB, queues [{}]".format(growth, depths)
+            if growth > memory_budget_mb:
+                message = message + ", OVER BUDGET ({:.1f} MB)".format(memory_budget_mb)
+            report(message)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, stop
+
+
+def stream_lane_detection(frames, crop_points, splits_per_half, memory_budget_mb=64, watchdog_interval=None):
+    """
+    Generator that runs detect_lanes() on every frame of a stream. A reader thread fills a queue,
+    that holds at most memory_budget_mb of frames, so a slow consumer can never make memory grow.
+
+    Parameters:
+    :param frames: iterable, frames/images, ex: frame_source().
+    :param crop_points: list, two (x,y) turples of the AOI, top-left & bottom-right.
+    :param splits_per_half: int, number of divides per each half (right & left) of the image.
+    :param memory_budget_mb: float, max size (megabytes) of the queued frames, also the allowed RSS,
+        growth reported by the watchdog.
+    :param watchdog_interval: float, seconds between watchdog reports, no watchdog if None.
+
+    Returns:
+    :returns: turple, (frame, avg_points_left, avg_points_right) for each frame, one at a time.
+
+    Raises:
+    :raises: any exception raised by frames, after the results of the frames read before it.
+    """
+
+    cx1, cy1, cx2, cy2 = sm.crop_edges(crop_points)
+
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return
+
+    # queue size from the memory budget, at least one frame
+    max_frames = max(1, int(memory_budget_mb * 1024 * 1024 // first.nbytes))
+    frame_queue = queue.Queue(maxsize=max_frames)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        frame = first
+        try:
+            while frame is not None and not stop.is_set():
+                # time out so the thread can stop if the consumer stops early
+                try:
+                    frame_queue.put(frame, timeout=0.1)
+                except queue.Full:
+                    continue
+                frame = next(frames, None)
+        except Exception as error:
+            # handed to the consumer, which raises it after the frames before it
+            errors.append(error)
+        finally:
+            # always end the stream, even if reading the frames failed
+            while not stop.is_set():
+                try:
+                    frame_queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    watchdog = None
+    if watchdog_interval is not None:
+        watchdog = start_watchdog({"frames": frame_queue}, memory_budget_mb, watchdog_interval)
+
+    try:
+        frame = 0
+        while True:
+            img = frame_queue.get()
+            if img is None:
+                if len(errors) > 0:
+                    raise errors[0]
+                break
+            frame = frame + 1
+
+            avg_points_left, avg_points_right = sm.detect_lanes(img[cy1:cy2, cx1:cx2], splits_per_half, False)
+            avg_points_left = sm.offset_to_original(avg_points_left, cx1, cy1)
+            avg_points_right = sm.offset_to_original(avg_points_right, cx1, cy1)
+
+            # drop the frame before handing out the result
+            del img
+            yield frame, avg_points_left, avg_points_right
+    finally:
+        stop.set()
+        if watchdog is not None:
+            watchdog[1].set()
+
+
+def write_results(results, path, flush_every=300):
+    """
+    Writes streamed results to a text file, one line per frame, flushing every flush_every frames,
+    so the writer never buffers more than a few hundred frames of output.
+
+    Parameters:
+    :param results: iterable, output of stream_lane_detection().
+    :param path: string, output file location/name.
+    :param flush_every: int, number of frames between flushes.
+
+    Returns:
+    :returns: int, number of frames written.
+    """
+
+    count = 0
+    with open(path, "w") as output:
+        for frame, avg_points_left, avg_points_right in results:
+            output.write(str(frame) + ";" + str(avg_points_left) + ";" + str(avg_points_right) + "\n")
+            count = count + 1
+            if count % flush_every == 0:
+                output.flush()
+    return count
@@ -3,9 +3,6 @@ Title:  User Input With Validation
 Description: Methods used for getting a user's input and validating it. 
 """
 
-import math
-import sys
-import cv2
 import os
 
 